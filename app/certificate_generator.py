@@ -4,10 +4,155 @@ Generates personalized certificates by drawing names onto template images using
 Simple, straightforward approach: load font → set position → draw text → save PDF.
 """
 
+import functools
+import io
 import os
-from pathlib import Path
+import tempfile
+from types import SimpleNamespace
+from typing import Iterator, Optional, Set, Tuple
+
 from PIL import Image, ImageDraw, ImageFont
 
+from app.paths import PROJECT_ROOT, resolve_project_path
+
+try:
+    from reportlab import rl_config
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas as pdf_canvas
+
+    # Write binary streams: ASCII85 inflates the embedded template by 25% and is
+    # encoded in pure Python unless the optional rl_accel extension is installed.
+    rl_config.useA85 = 0
+except ImportError:
+    # Without reportlab, certificates are rasterized with Pillow.
+    pdf_canvas = None
+
+# Templates are laid out in pixels at 300 DPI; PDF user space is 72 points per inch.
+_PX_TO_PT = 72.0 / 300.0
+
+_SYSTEM_FONT_PATHS = (
+    "C:/Windows/Fonts/arialbd.ttf",
+    "C:/Windows/Fonts/arial.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+)
+_FONT_NAMES = ("arialbd.ttf", "arial.ttf", "DejaVuSans-Bold.ttf", "DejaVuSans.ttf")
+
+
+@functools.lru_cache(maxsize=32)
+def _load_font(font_path: str, size: int) -> ImageFont.FreeTypeFont:
+    """Load a TrueType font, reusing the parsed face for repeated (path, size) pairs."""
+    return ImageFont.truetype(font_path, size=size)
+
+
+@functools.lru_cache(maxsize=4)
+def _load_template(template_path: str, mtime: float) -> Image.Image:
+    """Decode a template once per (path, mtime); callers must draw on a copy.
+
+    Opaque templates (e.g. JPEG) are kept as RGB, templates with transparency as RGBA.
+    """
+    with Image.open(template_path) as img_in:
+        return img_in.convert("RGBA" if img_in.has_transparency_data else "RGB")
+
+
+def _parse_hex_color(value: str) -> Tuple[int, int, int, int]:
+    """Parse "#RRGGBB" or "#RRGGBBAA" into an RGBA tuple (black if malformed)."""
+    color_hex = (value or "").strip()
+    if color_hex.startswith("#") and len(color_hex) in (7, 9):
+        try:
+            return tuple(bytes.fromhex(color_hex[1:].ljust(8, "f")))
+        except ValueError:
+            pass
+    return (0, 0, 0, 255)
+
+
+def _write_atomic(output_path: str, data: memoryview) -> None:
+    """Write to a temp file next to output_path, then rename it into place.
+
+    Readers (certificate_exists, FileResponse) see either no file or the complete PDF,
+    never a truncated one, even while another thread or worker process is rendering it.
+    """
+    tmp = tempfile.NamedTemporaryFile(dir=os.path.dirname(output_path), prefix=".", suffix=".tmp", delete=False)
+    try:
+        with tmp:
+            tmp.write(data)
+        # NamedTemporaryFile creates 0600; give the PDF the usual 0644
+        os.chmod(tmp.name, 0o644)
+        os.replace(tmp.name, output_path)
+    except BaseException:
+        os.unlink(tmp.name)
+        raise
+
+
+def _save_pdf(img: Image.Image, output_path: str) -> None:
+    """Encode the PDF in memory and write it to disk in a single call."""
+    buf = io.BytesIO()
+    img.save(buf, "PDF", resolution=300.0)
+    _write_atomic(output_path, buf.getbuffer())
+
+
+@functools.lru_cache(maxsize=4)
+def _template_size(template_path: str, mtime: float) -> Tuple[int, int]:
+    """Read template dimensions from the image header without decoding pixels."""
+    with Image.open(template_path) as img_in:
+        return img_in.size
+
+
+@functools.lru_cache(maxsize=8)
+def _register_pdf_font(font_path: str) -> Optional[str]:
+    """Register a TrueType font with reportlab once; None if it cannot be embedded."""
+    try:
+        pdfmetrics.registerFont(TTFont(font_path, font_path))
+    except Exception:
+        return None
+    return font_path
+
+
+def _save_vector_pdf(template_path: str, text: str, font: ImageFont.FreeTypeFont,
+                     xy: Tuple[float, float], color: Tuple[int, int, int, int],
+                     output_path: str) -> bool:
+    """Write the template as the page background with the name as a PDF text object.
+
+    The template file is embedded as-is and the name is never rasterized. Returns
+    False (writing nothing) when the font cannot be embedded, so callers can fall
+    back to Pillow.
+    """
+    font_name = _register_pdf_font(font.path)
+    if font_name is None:
+        return False
+
+    width, height = _template_size(template_path, os.path.getmtime(template_path))
+    page_w, page_h = width * _PX_TO_PT, height * _PX_TO_PT
+
+    # Pillow anchors text at the ascender line, PDF at the baseline (y grows upwards)
+    x, y = xy
+    ascent, _ = font.getmetrics()
+
+    buf = io.BytesIO()
+    pdf = pdf_canvas.Canvas(buf, pagesize=(page_w, page_h))
+    pdf.drawImage(template_path, 0, 0, width=page_w, height=page_h, mask="auto")
+    r, g, b, a = color
+    pdf.setFillColorRGB(r / 255, g / 255, b / 255, alpha=a / 255)
+    pdf.setFont(font_name, font.size * _PX_TO_PT)
+    pdf.drawString(x * _PX_TO_PT, page_h - (y + ascent) * _PX_TO_PT, text)
+    pdf.showPage()
+    pdf.save()
+    _write_atomic(output_path, buf.getbuffer())
+    return True
+
+
+def _open_template(template_path: str, name_color: tuple) -> Image.Image:
+    """Return a drawable copy of the template.
+
+    Stays in RGB when both the template and the name color are opaque, so the
+    RGBA -> RGB background composite before saving can be skipped.
+    """
+    template = _load_template(template_path, os.path.getmtime(template_path))
+    if template.mode == "RGB" and name_color[3] != 255:
+        return template.convert("RGBA")
+    return template.copy()
+
 
 class CertificateGenerator:
     """Generate personalized certificates from template images and export as PDF."""
@@ -22,67 +167,92 @@ class CertificateGenerator:
             output_dir: Directory for output PDFs
             management_template_path: Path to management certificate template
         """
-        project_root = Path(__file__).resolve().parents[1]
-        self._project_root = project_root
+        self._project_root = PROJECT_ROOT
         
         # Resolve template paths
-        self.template_path = self._resolve_path(template_path, project_root)
-        self.management_template_path = self._resolve_path(management_template_path, project_root)
+        self.template_path = resolve_project_path(template_path)
+        self.management_template_path = resolve_project_path(management_template_path)
         
         # Setup output directory
-        self.output_dir = str(project_root / output_dir)
+        self.output_dir = resolve_project_path(output_dir)
         os.makedirs(self.output_dir, exist_ok=True)
 
-    def _resolve_path(self, path_str: str, project_root: Path) -> str:
-        """Resolve a path relative to project root."""
-        candidate = Path(path_str.replace("\\", "/"))
-        if not candidate.is_absolute():
-            candidate = project_root / candidate
-        return str(candidate)
+        # Font lookup is resolved once per instance (see _resolve_font_path)
+        self._font_path_cache: Optional[str] = None
+        self._font_path_resolved: bool = False
+
+    @functools.cached_property
+    def _cfg(self) -> SimpleNamespace:
+        """Snapshot name placement env vars on first render; restart the server to pick up changes.
+
+        A malformed number raises ValueError here, so only renders fail and the app still starts.
+        """
+        cert_x = os.getenv("CERT_NAME_X")
+        cert_y = os.getenv("CERT_NAME_Y")
+        if cert_x and cert_y:
+            name_xy = (float(cert_x), float(cert_y))
+        else:
+            # Default hard-coded position for students
+            name_xy = (250, 550)
+
+        name_color_hex = os.getenv("CERT_NAME_COLOR", "#000000") or "#000000"
+        return SimpleNamespace(
+            font_size=int(os.getenv("CERT_NAME_FONT_SIZE", "70")),
+            name_xy=name_xy,
+            name_color=_parse_hex_color(name_color_hex),
+            mgmt_font_size=int(os.getenv("CERT_MGMT_NAME_FONT_SIZE", "55")),
+            # Use absolute coordinates (600, 500 for management)
+            mgmt_name_xy=(
+                float(os.getenv("CERT_MGMT_NAME_X", "600")),
+                float(os.getenv("CERT_MGMT_NAME_Y", "500")),
+            ),
+            mgmt_name_color=_parse_hex_color(os.getenv("CERT_MGMT_NAME_COLOR", name_color_hex)),
+            # "vector" embeds the template and writes the name as PDF text; "raster" draws it with Pillow
+            vector_pdf=pdf_canvas is not None
+            and (os.getenv("CERT_PDF_RENDERER", "vector") or "vector").strip().lower() != "raster",
+        )
 
     def _resolve_font_path(self) -> str:
-        """Resolve font path from environment or use system fonts."""
+        """Resolve font path from environment or use system fonts (cached after first hit)."""
+        if self._font_path_resolved:
+            return self._font_path_cache
+
+        font_path = self._find_font_path()
+        self._font_path_cache = font_path
+        self._font_path_resolved = True
+        return font_path
+
+    def _font_candidates(self) -> Iterator[str]:
+        """Yield font file locations lazily, in priority order."""
         # Try environment variable first
         env_font = (os.getenv("CERT_FONT_PATH") or "").strip()
         if env_font:
-            p = Path(env_font.replace("\\", "/"))
-            if not p.is_absolute():
-                p = self._project_root / p
-            if p.exists():
-                return str(p)
+            yield resolve_project_path(env_font)
 
         # Try project templates folder
-        candidates = [
-            self._project_root / "templates" / "DejaVuSans-Bold.ttf",
-            self._project_root / "templates" / "DejaVuSans.ttf",
-        ]
-        for c in candidates:
-            if c.exists():
-                return str(c)
+        templates_dir = self._project_root / "templates"
+        yield str(templates_dir / "DejaVuSans-Bold.ttf")
+        yield str(templates_dir / "DejaVuSans.ttf")
 
         # Try system paths
-        system_paths = [
-            "C:/Windows/Fonts/arialbd.ttf",
-            "C:/Windows/Fonts/arial.ttf",
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
-        ]
-        for font_path in system_paths:
-            if Path(font_path).exists():
-                return font_path
+        yield from _SYSTEM_FONT_PATHS
+
+    def _find_font_path(self) -> str:
+        """Search environment, project and system locations for a usable font."""
+        font_path = next((c for c in self._font_candidates() if os.path.isfile(c)), None)
+        if font_path:
+            return font_path
 
         # Try font names directly
-        for name in ["arialbd.ttf", "arial.ttf", "DejaVuSans-Bold.ttf", "DejaVuSans.ttf"]:
+        for name in _FONT_NAMES:
             try:
-                ImageFont.truetype(name, 12)
+                _load_font(name, 12)
                 return name
             except:
                 continue
 
         raise RuntimeError("No TrueType font found. Install a .ttf file in templates/ or set CERT_FONT_PATH.")
 
-        raise RuntimeError("No TrueType font found. Install a .ttf file in templates/ or set CERT_FONT_PATH.")
-
     def generate_certificate(self, student_name: str, certificate_id: str, course: str = None) -> str:
         """Generate a student certificate.
         
@@ -97,37 +267,20 @@ class CertificateGenerator:
         if not os.path.exists(self.template_path):
             raise FileNotFoundError(f"Template not found: {self.template_path}")
 
-        # Open template
-        with Image.open(self.template_path) as img_in:
-            img = img_in.convert("RGBA")
-            draw = ImageDraw.Draw(img)
-            width, height = img.size
-
         # Load font
-        font_path = self._resolve_font_path()
-        font_size = int(os.getenv("CERT_NAME_FONT_SIZE", "70"))
-        font = ImageFont.truetype(font_path, size=font_size)
+        font = _load_font(self._resolve_font_path(), self._cfg.font_size)
+        x, y = self._cfg.name_xy
+        name_color = self._cfg.name_color
+        output_path = os.path.join(self.output_dir, f"{certificate_id}.pdf")
 
-        # Get position
-        cert_x = os.getenv("CERT_NAME_X")
-        cert_y = os.getenv("CERT_NAME_Y")
-        
-        if cert_x and cert_y:
-            x, y = float(cert_x), float(cert_y)
-        else:
-            # Default hard-coded position for students
-            x, y = 250, 550
-
-        # Get color
-        color_hex = (os.getenv("CERT_NAME_COLOR", "#000000") or "#000000").strip()
-        if color_hex.startswith("#") and len(color_hex) >= 7:
-            r = int(color_hex[1:3], 16)
-            g = int(color_hex[3:5], 16)
-            b = int(color_hex[5:7], 16)
-            a = int(color_hex[7:9], 16) if len(color_hex) == 9 else 255
-            name_color = (r, g, b, a)
-        else:
-            name_color = (0, 0, 0, 255)
+        if self._cfg.vector_pdf and _save_vector_pdf(
+            self.template_path, student_name.strip(), font, (x, y), name_color, output_path
+        ):
+            return output_path
+
+        # Open template (decoded once, copied per certificate)
+        img = _open_template(self.template_path, name_color)
+        draw = ImageDraw.Draw(img)
 
         # Draw name
         draw.text((x, y), student_name.strip(), font=font, fill=name_color)
@@ -135,11 +288,10 @@ class CertificateGenerator:
         # Convert to RGB and save as PDF
         if img.mode != "RGB":
             background = Image.new("RGB", img.size, (255, 255, 255))
-            background.paste(img, mask=img.split()[-1])
+            background.paste(img, mask=img.getchannel("A"))
             img = background
 
-        output_path = os.path.join(self.output_dir, f"{certificate_id}.pdf")
-        img.save(output_path, "PDF", resolution=300.0)
+        _save_pdf(img, output_path)
         
         return output_path
     
@@ -159,6 +311,19 @@ class CertificateGenerator:
         output_path = os.path.join(self.output_dir, f"{certificate_id}.pdf")
         return os.path.exists(output_path)
     
+    def existing_certificate_ids(self) -> Set[str]:
+        """
+        List the IDs of all certificates already on disk (one directory scan)
+        
+        Returns:
+            Set of certificate IDs with a PDF in the output directory
+        """
+        if not self.output_dir or not os.path.isdir(self.output_dir):
+            return set()
+
+        with os.scandir(self.output_dir) as entries:
+            return {entry.name[:-4] for entry in entries if entry.name.endswith(".pdf")}
+    
     def get_certificate_path(self, certificate_id: str) -> str:
         """
         Get the path to a certificate
@@ -197,46 +362,31 @@ class CertificateGenerator:
         output_filename = f"{certificate_id}.pdf"
         output_path = os.path.join(self.output_dir, output_filename)
 
-        with Image.open(template) as img_in:
-            img = img_in.convert("RGBA")
-            draw = ImageDraw.Draw(img)
-
-            # Get font
-            font_path = self._resolve_font_path()
-            font_size = int(os.getenv("CERT_MGMT_NAME_FONT_SIZE", "55"))
-            font = ImageFont.truetype(font_path, size=font_size)
-
-            # Get color
-            color_hex = (os.getenv("CERT_MGMT_NAME_COLOR", os.getenv("CERT_NAME_COLOR", "#000000")) or "#000000").strip()
-            if color_hex.startswith("#") and len(color_hex) in (7, 9):
-                r = int(color_hex[1:3], 16)
-                g = int(color_hex[3:5], 16)
-                b = int(color_hex[5:7], 16)
-                a = int(color_hex[7:9], 16) if len(color_hex) == 9 else 255
-                name_color = (r, g, b, a)
-            else:
-                name_color = (0, 0, 0, 255)
-
-            # Get position - use absolute coordinates (600, 500 for management)
-            cert_mgmt_x = os.getenv("CERT_MGMT_NAME_X", "600")
-            cert_mgmt_y = os.getenv("CERT_MGMT_NAME_Y", "500")
-            
-            x, y = float(cert_mgmt_x), float(cert_mgmt_y)
+        # Get font, color and position
+        font = _load_font(self._resolve_font_path(), self._cfg.mgmt_font_size)
+        name_color = self._cfg.mgmt_name_color
+        x, y = self._cfg.mgmt_name_xy
 
-            # Draw name directly at position
-            name = (person_name or "").strip()
-            if not name:
-                raise ValueError("Person name is empty")
-            
-            draw.text((x, y), name, font=font, fill=name_color)
+        name = (person_name or "").strip()
+        if not name:
+            raise ValueError("Person name is empty")
+
+        if self._cfg.vector_pdf and _save_vector_pdf(template, name, font, (x, y), name_color, output_path):
+            return output_path
 
-            if img.mode != "RGB":
-                background = Image.new("RGB", img.size, (255, 255, 255))
-                background.paste(img, mask=img.split()[-1])
-                out_img = background
-            else:
-                out_img = img
+        img = _open_template(template, name_color)
+        draw = ImageDraw.Draw(img)
+
+        # Draw name directly at position
+        draw.text((x, y), name, font=font, fill=name_color)
+
+        if img.mode != "RGB":
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel("A"))
+            out_img = background
+        else:
+            out_img = img
 
-            out_img.save(output_path, "PDF", resolution=300.0)
+        _save_pdf(out_img, output_path)
 
         return output_path
@@ -4,13 +4,113 @@ Handles reading and searching student data from a CSV export
 """
 
 import csv
+import functools
 import os
-from pathlib import Path
-from typing import Optional, List, Dict, Iterable
+import threading
+import time
+from typing import Optional, List, Dict, Iterable, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    # pyarrow is optional; csv.DictReader handles parsing without it.
+    pa_csv = None
+
+from app.paths import PROJECT_ROOT, resolve_project_path
+
+# Column-oriented roster: logical field -> one string per row
+Columns = Dict[str, List[str]]
+# (normalized name, normalized ID) -> row number
+RowIndex = Dict[Tuple[str, str], int]
+# Normalized header -> (logical field, variant priority)
+VariantMap = Dict[str, Tuple[str, int]]
+# Logical field -> CSV columns providing it, best variant first
+Resolver = Dict[str, Tuple[str, ...]]
+
+# Env vars are fixed for the life of the process
+CERT_PREFIX = os.getenv("CERTIFICATE_ID_PREFIX", "CERT")
+MANAGEMENT_CERT_PREFIX = os.getenv("MANAGEMENT_CERT_ID_PREFIX", "CERT-MGMT")
+
+
+@functools.lru_cache(maxsize=1 << 15)
+def _certificate_id(identifier: str, name: Optional[str], prefix: str) -> str:
+    # Use name if provided, sanitize it for filename
+    if name:
+        # Sanitize name: remove special chars, replace spaces with underscores
+        sanitized_name = "".join(c if c.isalnum() or c == " " else "" for c in name)
+        sanitized_name = sanitized_name.strip().replace(" ", "_")
+        if sanitized_name:
+            return sanitized_name
+
+    # Fallback to ID-based format
+    return f"{prefix}-{identifier}"
+
+
+def _normalize_name(value: str) -> str:
+    # Collapse internal whitespace and normalize case (split() also trims the ends).
+    return " ".join((value or "").lower().split())
+
+
+def _normalize_student_id(value: str) -> str:
+    # Keep IDs as strings; remove leading/trailing whitespace.
+    return (value or "").strip()
+
+
+# ASCII characters dropped by _normalize_key (everything except letters, digits and "_")
+_KEY_DELETE_TABLE = {cp: None for cp in range(128) if not (chr(cp).isalnum() or chr(cp) == "_")}
+
+
+def _normalize_key(key: str) -> str:
+    key = (key or "").strip().lower()
+    if key.isascii():
+        return key.translate(_KEY_DELETE_TABLE)
+    # Non-ASCII headers keep Unicode letters/digits, so fall back to the per-char check
+    return "".join(ch for ch in key if ch.isalnum() or ch == "_")
+
+
+def _compile_variant_map(fields: Dict[str, Tuple[str, ...]]) -> VariantMap:
+    # The first (highest-priority) field to claim a normalized variant keeps it
+    variants: VariantMap = {}
+    for logical, names in fields.items():
+        for rank, name in enumerate(names):
+            variants.setdefault(_normalize_key(name), (logical, rank))
+    return variants
 
 
 class CSVHandler:
     """Handle CSV operations for student data"""
+
+    # Logical field -> accepted CSV header variants, in priority order
+    STUDENT_FIELDS: Dict[str, Tuple[str, ...]] = {
+        "Name": ("Name", "Full Name", "Student Name"),
+        "Student_Id": ("Student_Id", "Student ID", "StudentId", "Student_Id "),
+        "Email_id": ("Email_id", "Email id", "Email", "Email ID", "Email Address"),
+        "Course": ("Course", "Program", "Branch"),
+        "Code": ("Code", "Workshop", "Event", "Batch"),
+    }
+    MANAGEMENT_FIELDS: Dict[str, Tuple[str, ...]] = {
+        "Name": ("Name", "Full Name"),
+        "Student_Id": ("Student_Id", "Student ID", "StudentId", "Mgmt_Id"),
+        "Email_id": ("Email_id", "Email id", "Email", "Email ID", "Email Address"),
+        "Course": ("Course", "Program", "Branch"),
+        "Position": ("Position", "Title", "Role"),
+    }
+    # Normalized header variant -> (logical field, priority), compiled once
+    _STUDENT_VARIANTS = _compile_variant_map(STUDENT_FIELDS)
+    _MANAGEMENT_VARIANTS = _compile_variant_map(MANAGEMENT_FIELDS)
+
+    # Parsed columns and (name, id) index per (CSV path, field set), valid while (st_mtime_ns, st_size) match
+    _cache: Dict[Tuple[str, Tuple[str, ...]], Tuple[int, int, Columns, RowIndex]] = {}
+    _cache_lock = threading.Lock()
+
+    # Seconds a "students CSV not found" result is reused before probing again
+    _MISSING_PATH_TTL = 5.0
+
+    # Module-level normalizers; not memoized since /verify and /certificate pass client-supplied strings
+    _normalize_key = staticmethod(_normalize_key)
+    _normalize_name = staticmethod(_normalize_name)
+    _normalize_student_id = staticmethod(_normalize_student_id)
     
     def __init__(self, csv_path: str = "students.csv", management_csv_path: str = "management.csv"):
         """
@@ -20,64 +120,55 @@ class CSVHandler:
             csv_path: Path to the CSV file containing student data
             management_csv_path: Path to the CSV file containing management team data
         """
-        project_root = Path(__file__).resolve().parents[1]
-        normalized = (csv_path or "").replace("\\", "/")
-        candidate = Path(normalized)
-        if not candidate.is_absolute():
-            candidate = project_root / candidate
-
-        self.csv_path = str(candidate)
-        
-        normalized_mgmt = (management_csv_path or "").replace("\\", "/")
-        candidate_mgmt = Path(normalized_mgmt)
-        if not candidate_mgmt.is_absolute():
-            candidate_mgmt = project_root / candidate_mgmt
-        
-        self.management_csv_path = str(candidate_mgmt)
-        self._project_root = project_root
+        self._project_root = PROJECT_ROOT
+        self.csv_path = resolve_project_path(csv_path)
+        self.management_csv_path = resolve_project_path(management_csv_path)
+        # Effective students CSV once found; None until then
+        self._resolved_path: Optional[str] = None
+        # monotonic() deadline before which a failed lookup is not retried
+        self._missing_until = 0.0
 
     @staticmethod
-    def _normalize_key(key: str) -> str:
-        return "".join(ch for ch in (key or "").strip().lower() if ch.isalnum() or ch == "_")
-
-    @classmethod
-    def _get_first(cls, row: Dict[str, str], keys: Iterable[str]) -> str:
-        normalized_row = {cls._normalize_key(k): v for k, v in row.items()}
-        for key in keys:
-            value = normalized_row.get(cls._normalize_key(key))
-            if value is not None:
-                return str(value)
-        return ""
+    def _build_field_resolver(fieldnames: Iterable[str], variants: VariantMap) -> Resolver:
+        """Map each logical field to the CSV columns that can provide it, best variant first (one pass over the header)."""
+        by_rank: Dict[str, Dict[int, str]] = {}
+        for name in fieldnames:
+            if name is None:
+                continue
+            match = variants.get(_normalize_key(name))
+            if match is not None:
+                logical, rank = match
+                # For equal normalized keys the last column wins, as before
+                by_rank.setdefault(logical, {})[rank] = name
+        return {logical: tuple(columns[rank] for rank in sorted(columns)) for logical, columns in by_rank.items()}
 
     @staticmethod
-    def _normalize_name(value: str) -> str:
-        # Collapse internal whitespace and normalize case.
-        return " ".join((value or "").strip().lower().split())
+    def _apply_resolver(row: Dict[str, str], resolver: Resolver, fields: Iterable[str]) -> Dict[str, str]:
+        # A short row leaves cells as None: fall through to the next variant, else ""
+        return {
+            logical: next((row[column] for column in resolver.get(logical, ()) if row.get(column) is not None), "")
+            for logical in fields
+        }
 
     @staticmethod
-    def _normalize_student_id(value: str) -> str:
-        # Keep IDs as strings; remove leading/trailing whitespace.
-        return (value or "").strip()
+    def _coalesce(candidates: List[List[Optional[str]]], row_count: int) -> List[str]:
+        """Column-wise _apply_resolver: first non-None cell per row across candidate columns, else ""."""
+        if not candidates:
+            return [""] * row_count
+        values = candidates[0]
+        if len(candidates) > 1 and None in values:
+            values = [next((cell for cell in cells if cell is not None), None) for cells in zip(*candidates)]
+        return [value or "" for value in values]
 
     def normalize_student(self, row: Dict[str, str]) -> Dict[str, str]:
         """Return a canonical student dict regardless of CSV header variations."""
-        return {
-            "Name": self._get_first(row, ["Name", "Full Name", "Student Name"]),
-            "Student_Id": self._get_first(row, ["Student_Id", "Student ID", "StudentId", "Student_Id "]),
-            "Email_id": self._get_first(row, ["Email_id", "Email id", "Email", "Email ID", "Email Address"]),
-            "Course": self._get_first(row, ["Course", "Program", "Branch"]),
-            "Code": self._get_first(row, ["Code", "Workshop", "Event", "Batch"]),
-        }
+        resolver = self._build_field_resolver(row.keys(), self._STUDENT_VARIANTS)
+        return self._apply_resolver(row, resolver, self.STUDENT_FIELDS)
     
     def normalize_management(self, row: Dict[str, str]) -> Dict[str, str]:
         """Return a canonical management dict regardless of CSV header variations."""
-        return {
-            "Name": self._get_first(row, ["Name", "Full Name"]),
-            "Student_Id": self._get_first(row, ["Student_Id", "Student ID", "StudentId", "Mgmt_Id"]),
-            "Email_id": self._get_first(row, ["Email_id", "Email id", "Email", "Email ID", "Email Address"]),
-            "Course": self._get_first(row, ["Course", "Program", "Branch"]),
-            "Position": self._get_first(row, ["Position", "Title", "Role"]),
-        }
+        resolver = self._build_field_resolver(row.keys(), self._MANAGEMENT_VARIANTS)
+        return self._apply_resolver(row, resolver, self.MANAGEMENT_FIELDS)
         
     def get_all_students(self) -> List[Dict[str, str]]:
         """
@@ -89,6 +180,32 @@ class CSVHandler:
         Raises:
             FileNotFoundError: If CSV file doesn't exist
         """
+        columns, _ = self._load_students()
+        return self._rows(columns)
+
+    @staticmethod
+    def _rows(columns: Columns) -> List[Dict[str, str]]:
+        fields = list(columns)
+        return [dict(zip(fields, values)) for values in zip(*columns.values())]
+
+    @staticmethod
+    def _row_at(columns: Columns, i: int) -> Dict[str, str]:
+        return {field: values[i] for field, values in columns.items()}
+
+    def _load_students(self) -> Tuple[Columns, RowIndex]:
+        try:
+            return self._load(self._students_path(), self.STUDENT_FIELDS, self._STUDENT_VARIANTS)
+        except FileNotFoundError:
+            # The resolved file went away: search the fallbacks again next time
+            self._resolved_path = None
+            raise
+
+    def _students_path(self) -> str:
+        if self._resolved_path is not None:
+            return self._resolved_path
+        if time.monotonic() < self._missing_until:
+            raise FileNotFoundError(f"CSV file not found: {self.csv_path}")
+
         if not os.path.exists(self.csv_path):
             # Backward-compatible fallbacks (older deployments used data/students.csv)
             fallbacks = [
@@ -100,17 +217,88 @@ class CSVHandler:
                     self.csv_path = candidate
                     break
             else:
+                self._missing_until = time.monotonic() + self._MISSING_PATH_TTL
                 raise FileNotFoundError(f"CSV file not found: {self.csv_path}")
+
+        self._resolved_path = self.csv_path
+        return self._resolved_path
+
+    def _load(self, path: str, fields: Dict[str, Tuple[str, ...]], variants: VariantMap) -> Tuple[Columns, RowIndex]:
+        """
+        Parse a CSV once and reuse it until the file's mtime or size changes
         
-        students: List[Dict[str, str]] = []
+        Returns:
+            Normalized columns and an index of row numbers keyed by (normalized name, normalized ID)
+        """
+        st = os.stat(path)
+        # The same file may be read as both students and management; cache each field set separately
+        key = (path, tuple(fields))
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                return cached[2], cached[3]
+
+        fieldnames, raw_columns, row_count = self._read_columns(path)
+        # Header variants are resolved once per file, not once per row
+        resolver = self._build_field_resolver(fieldnames, variants)
+        columns: Columns = {
+            logical: self._coalesce([raw_columns[column] for column in resolver.get(logical, ())], row_count)
+            for logical in fields
+        }
+
+        index: RowIndex = {}
+        for i, (name, sid) in enumerate(zip(columns["Name"], columns["Student_Id"])):
+            # Keep the first match, as the previous linear scan did
+            index.setdefault((self._normalize_name(name), self._normalize_student_id(sid)), i)
+
+        with self._cache_lock:
+            self._cache[key] = (st.st_mtime_ns, st.st_size, columns, index)
+        return columns, index
+    
+    @staticmethod
+    def _read_columns(path: str) -> Tuple[List[str], Dict[str, List[Optional[str]]], int]:
+        """Return the CSV header, raw cells per column and the row count (pyarrow when installed)."""
+        if pa_csv is None:
+            return CSVHandler._read_dict_rows(path)
+
         # Use utf-8-sig to tolerate CSVs saved with a BOM (common with Excel/Forms exports)
-        with open(self.csv_path, 'r', encoding='utf-8-sig', newline='') as file:
+        with open(path, 'r', encoding='utf-8-sig', newline='') as file:
+            header = next(csv.reader(file), None)
+        if not header:
+            return [], {}, 0
+
+        try:
+            table = pa_csv.read_csv(
+                path,
+                read_options=pa_csv.ReadOptions(use_threads=True, block_size=1 << 20),
+                parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+                # Keep every cell a string (IDs may have leading zeros); empty cells stay ""
+                convert_options=pa_csv.ConvertOptions(
+                    column_types={name: pa.string() for name in header},
+                    strings_can_be_null=False,
+                ),
+            )
+        except pa.ArrowInvalid:
+            # Ragged rows etc.: DictReader is more forgiving
+            return CSVHandler._read_dict_rows(path)
+
+        # Arrow is already columnar: no per-row dicts are built
+        columns = {name: column.to_pylist() for name, column in zip(table.column_names, table.columns)}
+        return table.column_names, columns, table.num_rows
+
+    @staticmethod
+    def _read_dict_rows(path: str) -> Tuple[List[str], Dict[str, List[Optional[str]]], int]:
+        # A 1 MiB buffer cuts read() syscalls on large exports (default is 8 KiB)
+        with open(path, 'r', encoding='utf-8-sig', newline='', buffering=1 << 20) as file:
+            if hasattr(os, "posix_fadvise"):
+                # Linux: hint sequential access so the kernel reads ahead aggressively
+                os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
             reader = csv.DictReader(file)
-            for row in reader:
-                students.append(self.normalize_student(row))
-        
-        return students
-    
+            rows = list(reader)
+            fieldnames = list(reader.fieldnames or [])
+        columns = {name: [row.get(name) for row in rows] for name in fieldnames}
+        return fieldnames, columns, len(rows)
+
     def find_student_by_name_and_id(self, name: str, student_id: str) -> Optional[Dict[str, str]]:
         """
         Find a student by their name and student ID
@@ -122,21 +310,11 @@ class CSVHandler:
         Returns:
             Dictionary containing student data if found, None otherwise
         """
-        students = self.get_all_students()
-        
-        # Normalize inputs for comparison
-        name_normalized = self._normalize_name(name)
-        student_id_normalized = self._normalize_student_id(student_id)
-        
-        for student in students:
-            student_name = self._normalize_name(student.get('Name', ''))
-            student_sid = self._normalize_student_id(student.get('Student_Id', ''))
-            
-            # Match both name and student ID
-            if student_name == name_normalized and student_sid == student_id_normalized:
-                return student
+        columns, index = self._load_students()
         
-        return None
+        # Match both name and student ID
+        i = index.get((self._normalize_name(name), self._normalize_student_id(student_id)))
+        return None if i is None else self._row_at(columns, i)
     
     def generate_certificate_id(self, student_id: str, student_name: str = None) -> str:
         """
@@ -149,17 +327,7 @@ class CSVHandler:
         Returns:
             Certificate ID (name-based if available, otherwise ID-based)
         """
-        # Use student name if provided, sanitize it for filename
-        if student_name:
-            # Sanitize name: remove special chars, replace spaces with underscores
-            sanitized_name = "".join(c if c.isalnum() or c == " " else "" for c in student_name)
-            sanitized_name = sanitized_name.strip().replace(" ", "_")
-            if sanitized_name:
-                return sanitized_name
-        
-        # Fallback to ID-based format
-        prefix = os.getenv("CERTIFICATE_ID_PREFIX", "CERT")
-        return f"{prefix}-{student_id}"
+        return _certificate_id(student_id, student_name, CERT_PREFIX)
     
     def validate_csv_structure(self) -> bool:
         """
@@ -171,12 +339,12 @@ class CSVHandler:
         required_columns = {'Name', 'Student_Id'}
         
         try:
-            students = self.get_all_students()
-            if not students:
-                return False
+            # Only the header is needed; no rows are parsed
+            with open(self._students_path(), 'r', encoding='utf-8-sig', newline='') as file:
+                header = next(csv.reader(file))
             
-            first_row_keys = set(students[0].keys())
-            return required_columns.issubset(first_row_keys)
+            resolver = self._build_field_resolver(header, self._STUDENT_VARIANTS)
+            return required_columns.issubset(resolver)
             
         except Exception:
             return False
@@ -191,16 +359,14 @@ class CSVHandler:
         Raises:
             FileNotFoundError: If management CSV file doesn't exist
         """
+        columns, _ = self._load_management()
+        return self._rows(columns)
+
+    def _load_management(self) -> Tuple[Columns, RowIndex]:
         if not os.path.exists(self.management_csv_path):
             raise FileNotFoundError(f"Management CSV file not found: {self.management_csv_path}")
-        
-        management: List[Dict[str, str]] = []
-        with open(self.management_csv_path, 'r', encoding='utf-8-sig', newline='') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                management.append(self.normalize_management(row))
-        
-        return management
+
+        return self._load(self.management_csv_path, self.MANAGEMENT_FIELDS, self._MANAGEMENT_VARIANTS)
     
     def find_management_by_name(self, name: str) -> Optional[Dict[str, str]]:
         """
@@ -213,16 +379,15 @@ class CSVHandler:
             Dictionary containing management data if found, None otherwise
         """
         try:
-            management = self.get_all_management()
+            columns, _ = self._load_management()
         except FileNotFoundError:
             return None
         
         name_normalized = self._normalize_name(name)
         
-        for person in management:
-            person_name = self._normalize_name(person.get('Name', ''))
-            if person_name == name_normalized:
-                return person
+        for i, person_name in enumerate(columns["Name"]):
+            if self._normalize_name(person_name) == name_normalized:
+                return self._row_at(columns, i)
         
         return None
     
@@ -238,21 +403,12 @@ class CSVHandler:
             Dictionary containing management data if found, None otherwise
         """
         try:
-            management = self.get_all_management()
+            columns, index = self._load_management()
         except FileNotFoundError:
             return None
         
-        name_normalized = self._normalize_name(name)
-        mgmt_id_normalized = self._normalize_student_id(mgmt_id)
-        
-        for person in management:
-            person_name = self._normalize_name(person.get('Name', ''))
-            person_id = self._normalize_student_id(person.get('Student_Id', ''))
-            
-            if person_name == name_normalized and person_id == mgmt_id_normalized:
-                return person
-        
-        return None
+        i = index.get((self._normalize_name(name), self._normalize_student_id(mgmt_id)))
+        return None if i is None else self._row_at(columns, i)
     
     def generate_management_certificate_id(self, mgmt_id: str, person_name: str = None) -> str:
         """
@@ -265,15 +421,5 @@ class CSVHandler:
         Returns:
             Certificate ID (name-based if available, otherwise ID-based)
         """
-        # Use person name if provided, sanitize it for filename
-        if person_name:
-            # Sanitize name: remove special chars, replace spaces with underscores
-            sanitized_name = "".join(c if c.isalnum() or c == " " else "" for c in person_name)
-            sanitized_name = sanitized_name.strip().replace(" ", "_")
-            if sanitized_name:
-                return sanitized_name
-        
-        # Fallback to ID-based format
-        prefix = os.getenv("MANAGEMENT_CERT_ID_PREFIX", "CERT-MGMT")
-        return f"{prefix}-{mgmt_id}"
+        return _certificate_id(mgmt_id, person_name, MANAGEMENT_CERT_PREFIX)
 
@@ -3,9 +3,15 @@ FastAPI Certificate Distribution System
 Main application with all API endpoints
 """
 
+import asyncio
+import functools
+import hashlib
+import json
 import os
-from pathlib import Path
-from typing import Dict, Any, List
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, List, Optional, Tuple
 
 try:
     from dotenv import load_dotenv
@@ -15,25 +21,52 @@ except Exception:
     # dotenv is optional on Render; env vars are injected there.
     pass
 
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, ORJSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 
 from app.csv_handler import CSVHandler
 from app.certificate_generator import CertificateGenerator
+from app.paths import PROJECT_ROOT, resolve_project_path
+
+try:
+    import orjson  # noqa: F401
+
+    DefaultResponse = ORJSONResponse
+except ImportError:
+    # orjson is in requirements.txt; fall back to the stdlib encoder if it is missing.
+    DefaultResponse = JSONResponse
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    # Parse both CSVs before traffic arrives so the first /verify is a dict lookup.
+    loop = asyncio.get_running_loop()
+    for load in (csv_handler.get_all_students, csv_handler.get_all_management):
+        try:
+            await loop.run_in_executor(None, load)
+        except Exception:
+            # A missing/broken CSV must not block startup; endpoints report it per request.
+            pass
+
+    yield
+
+    if _render_pool is not None:
+        _render_pool.shutdown(wait=False, cancel_futures=True)
 
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Certificate Distribution System",
     description="A system for generating and distributing certificates",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=DefaultResponse,
+    lifespan=_lifespan,
 )
 
 # ---- Environment / Paths (Render-friendly) ----
 
-PROJECT_ROOT = Path(__file__).resolve().parents[1]
 TEMPLATES_DIR = PROJECT_ROOT / "templates"
 
 CSV_PATH = os.getenv("CSV_PATH", "students.csv")
@@ -43,14 +76,18 @@ TEMPLATE_IMAGE = os.getenv("CERTIFICATE_TEMPLATE_IMAGE", "templates/certificate_
 # Admin key for protected endpoints (optional)
 ADMIN_KEY = os.getenv("ADMIN_KEY", "")
 
+# Landing page is static: read it once at import (restart to pick up edits)
+INDEX_HTML_PATH = TEMPLATES_DIR / "index.html"
+INDEX_HTML_BYTES = INDEX_HTML_PATH.read_bytes() if INDEX_HTML_PATH.exists() else None
+INDEX_HTML_ETAG = f'"{hashlib.sha256(INDEX_HTML_BYTES).hexdigest()[:32]}"' if INDEX_HTML_BYTES else None
+
 
-def _as_abs(path_str: str) -> str:
-    # Allow Windows-style env var paths (e.g., "data\\students.csv") even on Linux.
-    normalized = (path_str or "").replace("\\", "/")
-    p = Path(normalized)
-    if not p.is_absolute():
-        p = PROJECT_ROOT / p
-    return str(p)
+# Resolved once; these never change at runtime
+CSV_ABS = resolve_project_path(CSV_PATH)
+MANAGEMENT_CSV_ABS = resolve_project_path("management.csv")
+TEMPLATE_ABS = resolve_project_path(TEMPLATE_IMAGE)
+MANAGEMENT_TEMPLATE_ABS = resolve_project_path("templates/CertificateManagement.jpeg")
+CERTIFICATES_ABS = resolve_project_path(CERTIFICATES_DIR)
 
 
 # Add CORS middleware (configure allowed origins via env var)
@@ -66,36 +103,65 @@ app.add_middleware(
 
 
 # Initialize handlers
-csv_handler = CSVHandler(_as_abs(CSV_PATH), management_csv_path=_as_abs("management.csv"))
+csv_handler = CSVHandler(CSV_ABS, management_csv_path=MANAGEMENT_CSV_ABS)
 cert_generator = CertificateGenerator(
-    template_path=_as_abs(TEMPLATE_IMAGE),
-    output_dir=_as_abs(CERTIFICATES_DIR),
-    management_template_path=_as_abs("templates/CertificateManagement.jpeg"),
+    template_path=TEMPLATE_ABS,
+    output_dir=CERTIFICATES_ABS,
+    management_template_path=MANAGEMENT_TEMPLATE_ABS,
 )
 
 
+# Worker processes for bulk PDF rendering (created on first use)
+_render_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_render_pool() -> ProcessPoolExecutor:
+    global _render_pool
+    if _render_pool is None:
+        _render_pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+    return _render_pool
+
+
+def _discard_render_pool(pool: ProcessPoolExecutor) -> None:
+    # A worker died (e.g. OOM kill) and the executor is unusable; the next call builds a new one.
+    global _render_pool
+    if _render_pool is pool:
+        _render_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _render_certificate(name: str, certificate_id: str, course: Optional[str]) -> str:
+    # Module-level so it can be pickled into the worker processes.
+    cert_generator.generate_certificate(student_name=name, certificate_id=certificate_id, course=course)
+    return certificate_id
+
+
+def _render_management_certificate(name: str, certificate_id: str) -> str:
+    cert_generator.generate_management_certificate(person_name=name, certificate_id=certificate_id)
+    return certificate_id
+
+
 # Serve templates directory as static (optional assets)
 if TEMPLATES_DIR.exists():
     app.mount("/static", StaticFiles(directory=str(TEMPLATES_DIR)), name="static")
 
 
 @app.get("/", response_class=HTMLResponse)
-async def home():
+async def home(request: Request):
     """
     Serve the main HTML interface
     
     Returns:
-        HTML page with certificate search form
+        HTML page with certificate search form (304 if the client's ETag matches)
     """
-    html_path = TEMPLATES_DIR / "index.html"
-
-    if not html_path.exists():
+    if INDEX_HTML_BYTES is None:
         raise HTTPException(status_code=500, detail="Template file not found")
 
-    with open(html_path, 'r', encoding='utf-8') as file:
-        html_content = file.read()
+    headers = {"ETag": INDEX_HTML_ETAG}
+    if request.headers.get("if-none-match") == INDEX_HTML_ETAG:
+        return Response(status_code=304, headers=headers)
 
-    return HTMLResponse(content=html_content)
+    return HTMLResponse(content=INDEX_HTML_BYTES, headers=headers)
 
 
 @app.get("/health")
@@ -106,19 +172,15 @@ async def health_check() -> Dict[str, Any]:
     Returns:
         Status message
     """
-    csv_abs = _as_abs(CSV_PATH)
-    template_abs = _as_abs(TEMPLATE_IMAGE)
-    certificates_abs = _as_abs(CERTIFICATES_DIR)
-
     return {
         "status": "running",
         "paths": {
-            "csv": csv_abs,
-            "csv_exists": Path(csv_abs).exists(),
-            "template_image": template_abs,
-            "template_exists": Path(template_abs).exists(),
-            "certificates_dir": certificates_abs,
-            "certificates_dir_exists": Path(certificates_abs).exists(),
+            "csv": CSV_ABS,
+            "csv_exists": os.path.exists(CSV_ABS),
+            "template_image": TEMPLATE_ABS,
+            "template_exists": os.path.exists(TEMPLATE_ABS),
+            "certificates_dir": CERTIFICATES_ABS,
+            "certificates_dir_exists": os.path.exists(CERTIFICATES_ABS),
         },
     }
 
@@ -138,8 +200,10 @@ async def verify_certificate(name: str, student_id: str) -> Dict[str, Any]:
     Raises:
         HTTPException: If student not found
     """
+    loop = asyncio.get_running_loop()
     try:
-        student = csv_handler.find_student_by_name_and_id(name, student_id)
+        # A cold cache parses the CSV; keep that off the event loop
+        student = await loop.run_in_executor(None, csv_handler.find_student_by_name_and_id, name, student_id)
     except FileNotFoundError as e:
         raise HTTPException(
             status_code=503,
@@ -190,8 +254,10 @@ async def get_certificate(
         HTTPException: If student not found in database
     """
     # Verify student exists
+    loop = asyncio.get_running_loop()
     try:
-        student = csv_handler.find_student_by_name_and_id(name, student_id)
+        # A cold cache parses the CSV; keep that off the event loop
+        student = await loop.run_in_executor(None, csv_handler.find_student_by_name_and_id, name, student_id)
     except FileNotFoundError as e:
         raise HTTPException(
             status_code=503,
@@ -215,11 +281,12 @@ async def get_certificate(
     # Render/WebService: cache PDFs on disk
     if force or (not cert_generator.certificate_exists(certificate_id)):
         try:
-            cert_generator.generate_certificate(
+            await loop.run_in_executor(None, functools.partial(
+                cert_generator.generate_certificate,
                 student_name=student.get("Name"),
                 certificate_id=certificate_id,
                 course=None,  # Don't include course in student certificates
-            )
+            ))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error generating certificate: {str(e)}")
 
@@ -228,19 +295,23 @@ async def get_certificate(
 
 
 @app.get("/generate-all")
-async def generate_all_certificates(admin_key: str = Query(..., description="Admin key for authorization")) -> Dict[str, Any]:
+async def generate_all_certificates(admin_key: str = Query(..., description="Admin key for authorization")) -> StreamingResponse:
     """
     Admin endpoint to generate all certificates from CSV
     Protected by admin key
     
+    PDFs are rendered in a process pool and progress is streamed as NDJSON:
+    one {"certificate_id", "status"} line per student ("generated", "skipped"
+    or "error"), followed by a final summary line.
+    
     Args:
         admin_key: Admin authorization key
         
     Returns:
-        Summary of generated certificates
+        Streaming NDJSON response
         
     Raises:
-        HTTPException: If admin key is invalid or generation fails
+        HTTPException: If admin key is invalid or the CSV cannot be read
     """
     # Verify admin key (only enforced if ADMIN_KEY is set)
     if ADMIN_KEY and admin_key != ADMIN_KEY:
@@ -250,45 +321,82 @@ async def generate_all_certificates(admin_key: str = Query(..., description="Adm
         )
     
     try:
-        students = csv_handler.get_all_students()
-        generated = []
-        skipped = []
-        
-        for student in students:
-            student_id = student.get("Student_Id")
-            name = student.get("Name")
-            
-            # Generate certificate ID
-            certificate_id = csv_handler.generate_certificate_id(student_id, name)
-            
-            # Skip if already exists
-            if cert_generator.certificate_exists(certificate_id):
-                skipped.append(certificate_id)
-                continue
-            
-            # Generate certificate
-            cert_generator.generate_certificate(
-                student_name=name,
-                certificate_id=certificate_id,
-                course=student.get("Course"),
-            )
-            generated.append(certificate_id)
-        
-        return {
-            "success": True,
-            "total_students": len(students),
-            "generated": len(generated),
-            "skipped": len(skipped),
-            "generated_ids": generated,
-            "skipped_ids": skipped
-        }
-        
+        students = await asyncio.get_running_loop().run_in_executor(None, csv_handler.get_all_students)
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error generating certificates: {str(e)}"
         )
 
+    def _line(payload: Dict[str, Any]) -> str:
+        return json.dumps(payload) + "\n"
+
+    async def _stream():
+        loop = asyncio.get_running_loop()
+        # Bound the number of queued renders so memory stays flat for large rosters
+        max_in_flight = 2 * (os.cpu_count() or 1)
+        # Future -> (certificate ID, pool it was submitted to)
+        pending: Dict[asyncio.Future, Tuple[str, ProcessPoolExecutor]] = {}
+        queued = set()
+        counts = {"generated": 0, "skipped": 0, "error": 0}
+        # One directory scan instead of a stat per student
+        existing = cert_generator.existing_certificate_ids()
+
+        def _finished(done) -> List[str]:
+            lines = []
+            for future in done:
+                certificate_id, pool = pending.pop(future)
+                error = future.exception()
+                if error is None:
+                    counts["generated"] += 1
+                    lines.append(_line({"certificate_id": certificate_id, "status": "generated"}))
+                else:
+                    if isinstance(error, BrokenProcessPool):
+                        _discard_render_pool(pool)
+                    counts["error"] += 1
+                    lines.append(_line({"certificate_id": certificate_id, "status": "error", "detail": str(error)}))
+            return lines
+
+        for student in students:
+            name = student.get("Name")
+            certificate_id = csv_handler.generate_certificate_id(student.get("Student_Id"), name)
+            
+            # Skip if already exists (or is already being rendered for a duplicate row)
+            if certificate_id in queued or certificate_id in existing:
+                counts["skipped"] += 1
+                yield _line({"certificate_id": certificate_id, "status": "skipped"})
+                continue
+
+            pool = _get_render_pool()
+            try:
+                future = loop.run_in_executor(pool, _render_certificate, name, certificate_id, student.get("Course"))
+            except BrokenProcessPool as e:
+                _discard_render_pool(pool)
+                counts["error"] += 1
+                yield _line({"certificate_id": certificate_id, "status": "error", "detail": str(e)})
+                continue
+            pending[future] = (certificate_id, pool)
+            queued.add(certificate_id)
+            if len(pending) >= max_in_flight:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for line in _finished(done):
+                    yield line
+
+        if pending:
+            done, _ = await asyncio.wait(pending)
+            for line in _finished(done):
+                yield line
+
+        yield _line({
+            "success": counts["error"] == 0,
+            "total_students": len(students),
+            "generated": counts["generated"],
+            "skipped": counts["skipped"],
+            "errors": counts["error"],
+        })
+
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
+
 
 @app.get("/verify-management")
 async def verify_management_certificate(name: str, mgmt_id: str) -> Dict[str, Any]:
@@ -305,8 +413,9 @@ async def verify_management_certificate(name: str, mgmt_id: str) -> Dict[str, An
     Raises:
         HTTPException: If person not found
     """
+    loop = asyncio.get_running_loop()
     try:
-        person = csv_handler.find_management_by_name_and_id(name, mgmt_id)
+        person = await loop.run_in_executor(None, csv_handler.find_management_by_name_and_id, name, mgmt_id)
     except FileNotFoundError as e:
         raise HTTPException(
             status_code=503,
@@ -356,8 +465,9 @@ async def get_management_certificate(
         HTTPException: If person not found in database
     """
     # Verify person exists
+    loop = asyncio.get_running_loop()
     try:
-        person = csv_handler.find_management_by_name_and_id(name, mgmt_id)
+        person = await loop.run_in_executor(None, csv_handler.find_management_by_name_and_id, name, mgmt_id)
     except FileNotFoundError as e:
         raise HTTPException(
             status_code=503,
@@ -381,10 +491,11 @@ async def get_management_certificate(
     # Cache PDFs on disk
     if force or (not cert_generator.certificate_exists(certificate_id)):
         try:
-            cert_generator.generate_management_certificate(
+            await loop.run_in_executor(None, functools.partial(
+                cert_generator.generate_management_certificate,
                 person_name=person.get("Name"),
                 certificate_id=certificate_id,
-            )
+            ))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error generating management certificate: {str(e)}")
 
@@ -414,10 +525,13 @@ async def generate_all_management_certificates(admin_key: str = Query(..., descr
             detail="Invalid admin key"
         )
     
+    loop = asyncio.get_running_loop()
     try:
-        management = csv_handler.get_all_management()
-        generated = []
+        management = await loop.run_in_executor(None, csv_handler.get_all_management)
+        tasks = []
         skipped = []
+        # One directory scan instead of a stat per person
+        existing = cert_generator.existing_certificate_ids()
         
         for person in management:
             mgmt_id = person.get("Student_Id")
@@ -425,23 +539,39 @@ async def generate_all_management_certificates(admin_key: str = Query(..., descr
             certificate_id = csv_handler.generate_management_certificate_id(mgmt_id, name)
             
             # Skip if already exists
-            if cert_generator.certificate_exists(certificate_id):
+            if certificate_id in existing:
                 skipped.append(certificate_id)
                 continue
             
-            # Generate certificate
-            cert_generator.generate_management_certificate(
-                person_name=name,
-                certificate_id=certificate_id
-            )
-            generated.append(certificate_id)
+            # Queue certificate for generation
+            tasks.append((name, certificate_id))
+            existing.add(certificate_id)
+        
+        # Render in parallel across worker processes without blocking the event loop
+        pool = _get_render_pool()
+        futures = []
+        errors: List[BaseException] = []
+        for name, certificate_id in tasks:
+            try:
+                futures.append(loop.run_in_executor(pool, _render_management_certificate, name, certificate_id))
+            except BrokenProcessPool as e:
+                errors.append(e)
+                break
+        # Wait for everything already submitted so no future is left unobserved
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        errors.extend(r for r in results if isinstance(r, BaseException))
+        if any(isinstance(e, BrokenProcessPool) for e in errors):
+            _discard_render_pool(pool)
+        if errors:
+            raise errors[0]
+        generated = results
         
         return {
             "success": True,
             "total_management": len(management),
             "generated": len(generated),
             "skipped": len(skipped),
-            "generated_ids": generated,
+            "generated_ids": list(generated),
             "skipped_ids": skipped
         }
         
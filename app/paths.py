@@ -0,0 +1,18 @@
+"""
+Paths Module
+Resolves configured file paths against the project root
+"""
+
+import os
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+
+def resolve_project_path(path_str: str) -> str:
+    """Return an absolute path; relative paths are taken from the project root."""
+    # Accept Windows-style separators (e.g. "data\\students.csv") even on Linux
+    path = (path_str or "").replace("\\", "/")
+    if not os.path.isabs(path):
+        path = os.path.join(PROJECT_ROOT, path)
+    return os.path.normpath(path)